@@ -37,6 +37,8 @@ class Settings:
     YANDEX_API_KEY: Optional[str] = os.getenv('YANDEX_API_KEY')
     YANDEX_FOLDER_ID: Optional[str] = os.getenv('YANDEX_FOLDER_ID')
     SENTIMENT_INTERVAL: int = int(os.getenv('SENTIMENT_INTERVAL', '60'))
+    SENTIMENT_MAX_CONCURRENCY: int = int(os.getenv('SENTIMENT_MAX_CONCURRENCY', '5'))
+    SENTIMENT_BATCH_SIZE: int = int(os.getenv('SENTIMENT_BATCH_SIZE', '100'))
     
     # Optional: Telegram Bot (for notifications)
     BOT_TOKEN: Optional[str] = os.getenv('BOT_TOKEN')
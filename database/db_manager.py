@@ -5,8 +5,8 @@ Handles initialization, table creation, and common operations
 import os
 import logging
 import time
-from typing import Optional
-from sqlalchemy import create_engine
+from typing import Callable, Optional
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.exc import SQLAlchemyError, OperationalError
 from sqlalchemy.engine import Engine
@@ -49,16 +49,46 @@ class DatabaseManager:
         
         # Enable WAL mode for better concurrency
         self._enable_wal_mode()
-    
+
+        # Optional callback fired after each new comment is committed
+        # (used by the sentiment worker for event-driven wakeups)
+        self._comment_listener: Optional[Callable[[], None]] = None
+
+    def set_comment_listener(self, callback: Optional[Callable[[], None]]):
+        """
+        Register a callback invoked after a new comment is saved
+
+        The callback runs on the thread that saved the comment and must be
+        thread-safe and cheap (e.g. loop.call_soon_threadsafe).
+
+        Args:
+            callback: Zero-argument callable, or None to unregister
+        """
+        self._comment_listener = callback
+
+
     def _enable_wal_mode(self):
-        """Enable WAL (Write-Ahead Logging) mode for better concurrency"""
+        """Enable WAL (Write-Ahead Logging) mode for better concurrency
+
+        journal_mode=WAL is persistent, but synchronous/busy_timeout/temp_store
+        are per-connection pragmas, so they are set via a connect listener on
+        every new pooled connection. synchronous=NORMAL drops the per-commit
+        fsync (safe here: the batch jobs are idempotent via processed=1, a
+        crash only loses the in-flight transaction).
+        """
+        @event.listens_for(self.engine, "connect")
+        def _set_sqlite_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+            cursor.execute("PRAGMA busy_timeout=30000")  # 30 seconds
+            cursor.execute("PRAGMA temp_store=MEMORY")
+            cursor.close()
+
         try:
-            from sqlalchemy import text
-            with self.engine.connect() as conn:
-                conn.execute(text("PRAGMA journal_mode=WAL"))
-                conn.execute(text("PRAGMA synchronous=NORMAL"))
-                conn.execute(text("PRAGMA busy_timeout=30000"))  # 30 seconds
-                conn.commit()
+            # Force one connection so WAL mode is established immediately
+            with self.engine.connect():
+                pass
             logger.debug("WAL mode enabled for SQLite")
         except Exception as e:
             logger.warning(f"Could not enable WAL mode: {e}")
@@ -67,6 +97,16 @@ class DatabaseManager:
         """Initialize database - create all tables and indexes"""
         try:
             Base.metadata.create_all(bind=self.engine)
+            # create_all does not add new indexes to pre-existing tables,
+            # so ensure them explicitly for databases created before the
+            # indexes were introduced
+            from sqlalchemy import text
+            with self.engine.connect() as conn:
+                conn.execute(text(
+                    "CREATE INDEX IF NOT EXISTS idx_processed_id "
+                    "ON comments (processed, id)"
+                ))
+                conn.commit()
             logger.info(f"Database initialized at {self.db_path}")
             logger.info("Tables and indexes created successfully")
         except SQLAlchemyError as e:
@@ -152,6 +192,14 @@ class DatabaseManager:
                 session.add(comment)
                 session.commit()
                 logger.info(f"Comment saved: {comment_data['source']}:{comment_data['source_comment_id']}")
+
+                # Notify the listener only after a successful commit
+                if self._comment_listener is not None:
+                    try:
+                        self._comment_listener()
+                    except Exception as e:
+                        logger.warning(f"Comment listener failed: {e}")
+
                 return True
                 
             except SQLAlchemyError as e:
@@ -166,22 +214,24 @@ class DatabaseManager:
             logger.error(f"Error saving comment after retries: {e}")
             return False
     
-    def get_unprocessed_comments(self, limit: int = 100) -> list:
+    def get_unprocessed_comments(self, limit: int = 100,
+                                 exclude_ids: Optional[list] = None) -> list:
         """
         Get unprocessed comments for sentiment analysis
-        
+
         Args:
             limit: Maximum number of comments to return
-            
+            exclude_ids: Comment ids to skip (e.g. a batch already in flight)
+
         Returns:
             List of Comment objects
         """
         session = self.get_session()
         try:
-            comments = session.query(Comment).filter(
-                Comment.processed == 0
-            ).limit(limit).all()
-            return comments
+            query = session.query(Comment).filter(Comment.processed == 0)
+            if exclude_ids:
+                query = query.filter(~Comment.id.in_(exclude_ids))
+            return query.limit(limit).all()
         finally:
             session.close()
     
@@ -231,6 +281,51 @@ class DatabaseManager:
             logger.error(f"Error updating sentiment after retries: {e}")
             return False
     
+    def update_sentiment_bulk(self, rows: list) -> bool:
+        """
+        Update sentiment results for many comments in a single transaction
+
+        Amortizes the commit/fsync cost across the batch instead of paying
+        it once per comment.
+
+        Args:
+            rows: List of (comment_id, sentiment, sentiment_score, processed)
+                tuples
+
+        Returns:
+            True if the batch was committed, False otherwise
+        """
+        if not rows:
+            return True
+
+        def _update():
+            session = self.get_session()
+            try:
+                for comment_id, sentiment, sentiment_score, processed in rows:
+                    session.query(Comment).filter(Comment.id == comment_id).update(
+                        {
+                            Comment.sentiment: sentiment,
+                            Comment.sentiment_score: sentiment_score,
+                            Comment.processed: processed,
+                        },
+                        synchronize_session=False
+                    )
+                session.commit()
+                logger.info(f"Sentiment updated for {len(rows)} comments in one transaction")
+                return True
+
+            except SQLAlchemyError:
+                session.rollback()
+                raise
+            finally:
+                session.close()
+
+        try:
+            return self._retry_on_lock(_update)
+        except SQLAlchemyError as e:
+            logger.error(f"Error bulk updating sentiment after retries: {e}")
+            return False
+
     def get_statistics(self) -> dict:
         """
         Get database statistics
@@ -59,6 +59,9 @@ class Comment(Base):
         Index('idx_source_comment', 'source_comment_id', 'source'),
         Index('idx_comment_published_at', 'comment_published_at'),
         Index('idx_processed', 'processed'),
+        # Covering index for the sentiment worker stream query
+        # (WHERE processed=0 ORDER BY id)
+        Index('idx_processed_id', 'processed', 'id'),
     )
     
     def __repr__(self):
@@ -160,14 +160,16 @@ async def main():
         try:
             analyzer = YandexSentimentAnalyzer(
                 settings.YANDEX_API_KEY,
-                settings.YANDEX_FOLDER_ID
+                settings.YANDEX_FOLDER_ID,
+                max_concurrency=settings.SENTIMENT_MAX_CONCURRENCY
             )
             sentiment_worker = SentimentWorker(
                 db_manager,
                 analyzer,
                 interval=settings.SENTIMENT_INTERVAL,
                 bot_token=settings.BOT_TOKEN,
-                alert_chat_id=settings.ALERT_CHAT_ID
+                alert_chat_id=settings.ALERT_CHAT_ID,
+                batch_size=settings.SENTIMENT_BATCH_SIZE
             )
             await sentiment_worker.start()
             logger.info("Sentiment worker started")
@@ -212,7 +214,11 @@ async def main():
         # Stop VK monitor
         if vk_monitor:
             await vk_monitor.stop()
-        
+
+        # Close shared HTTP session
+        from sentiment.http_client import close_session
+        await close_session()
+
         # Cancel any remaining tasks
         for task in tasks:
             if not task.done():
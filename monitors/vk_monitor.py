@@ -3,12 +3,16 @@ VK Comment Monitor
 Adapted from monitorshik-vk/monitor.py
 Monitors comments in VK groups and user pages
 """
+import asyncio
+import html
+import random
 import time
 import re
 import threading
 import logging
 from datetime import datetime, timedelta
 from typing import Optional, List, Dict, Any, Tuple
+import orjson
 import requests
 from dateutil import parser
 
@@ -17,6 +21,28 @@ from database.db_manager import DatabaseManager
 
 logger = logging.getLogger(__name__)
 
+# Шаблоны уведомлений (компилируются один раз при импорте,
+# вместо пересборки f-строк на каждый комментарий)
+_TMPL_TEXT = """🔵 <b>VK</b> | {owner_name}
+👤 <a href="{author_url}">{author_name}</a>
+🆔 <code>{author_id}</code>
+🕐 {time_str}
+━━━━━━━━━━━━━━━━━━
+<blockquote>{text}</blockquote>
+
+<a href="{post_url}">🔗 Открыть пост</a>
+<a href="{comment_url}">💬 Открыть комментарий</a>"""
+
+_TMPL_MEDIA = """🔵 <b>VK</b> | {owner_name}
+👤 <a href="{author_url}">{author_name}</a>
+🆔 <code>{author_id}</code>
+🕐 {time_str}
+━━━━━━━━━━━━━━━━━━
+<b>Пользователь прислал медиафайл, пожалуйста откройте комментарий чтобы увидеть содержание</b>
+
+<a href="{post_url}">🔗 Открыть пост</a>
+<a href="{comment_url}">💬 Открыть комментарий</a>"""
+
 
 class VKMonitor(BaseMonitor):
     """VK comment monitor"""
@@ -96,10 +122,8 @@ class VKMonitor(BaseMonitor):
         logger.info("Stopping VK monitor...")
         self._running = False
         if self._thread:
-            # Wait for thread to finish in background
-            import asyncio
-            loop = asyncio.get_event_loop()
-            await loop.run_in_executor(None, lambda: self._thread.join(10))
+            # Wait for thread to finish without blocking the event loop
+            await asyncio.to_thread(self._thread.join, 10)
         logger.info("VK monitor stopped")
     
     def _monitoring_loop(self):
@@ -134,8 +158,10 @@ class VKMonitor(BaseMonitor):
             response = requests.get(url, params=params, timeout=10)
             response.raise_for_status()
             
-            data = response.json()
-            
+            # orjson заметно быстрее stdlib json на больших ответах VK
+            # (комментарии + profiles + groups)
+            data = orjson.loads(response.content)
+
             if 'error' in data:
                 error = data['error']
                 logger.error(
@@ -450,33 +476,20 @@ class VKMonitor(BaseMonitor):
         dt = datetime.utcfromtimestamp(timestamp) + timedelta(hours=3)  # +3 часа для московского времени
         time_str = dt.strftime('%H:%M %d.%m.%Y')
         
-        # Comment text
-        text = comment.get('text', '').strip()
-        attachments = comment.get('attachments', [])
-        has_media = len(attachments) > 0
-        
-        if text:
-            message = f"""🔵 <b>VK</b> | {owner_name}
-👤 <a href="{author_url}">{author_name}</a>
-🆔 <code>{author_id}</code>
-🕐 {time_str}
-━━━━━━━━━━━━━━━━━━
-<blockquote>{text}</blockquote>
+        # Comment text (экранируем HTML, чтобы '<' в тексте не ломал parse_mode=HTML)
+        text = html.escape(comment.get('text', '').strip(), quote=False)
 
-<a href="{post_url}">🔗 Открыть пост</a>
-<a href="{comment_url}">💬 Открыть комментарий</a>"""
-        else:
-            message = f"""🔵 <b>VK</b> | {owner_name}
-👤 <a href="{author_url}">{author_name}</a>
-🆔 <code>{author_id}</code>
-🕐 {time_str}
-━━━━━━━━━━━━━━━━━━
-<b>Пользователь прислал медиафайл, пожалуйста откройте комментарий чтобы увидеть содержание</b>
-
-<a href="{post_url}">🔗 Открыть пост</a>
-<a href="{comment_url}">💬 Открыть комментарий</a>"""
-        
-        return message
+        template = _TMPL_TEXT if text else _TMPL_MEDIA
+        return template.format(
+            owner_name=html.escape(owner_name, quote=False),
+            author_url=author_url,
+            author_name=html.escape(author_name, quote=False),
+            author_id=author_id,
+            time_str=time_str,
+            text=text,
+            post_url=post_url,
+            comment_url=comment_url
+        )
     
     def _send_telegram_notification(self, message: str, bot_token: str, chat_id: str) -> bool:
         """
@@ -492,14 +505,20 @@ class VKMonitor(BaseMonitor):
             'disable_web_page_preview': False
         }
         
-        retry_count = 3
+        retry_count = 5
+        base_delay, max_delay = 1.0, 30.0
         for attempt in range(retry_count):
             try:
                 response = requests.post(url, json=params, timeout=10)
                 
                 if response.status_code == 429:
                     # Rate limit exceeded
-                    retry_after = response.json().get('parameters', {}).get('retry_after', 5)
+                    # Тело может оказаться не-JSON (HTML-страница прокси/CDN) -
+                    # тогда ждем дефолтные 5 секунд, а не роняем цикл
+                    try:
+                        retry_after = orjson.loads(response.content).get('parameters', {}).get('retry_after', 5)
+                    except (orjson.JSONDecodeError, AttributeError):
+                        retry_after = 5
                     logger.warning(f"Telegram rate limit hit, waiting {retry_after} seconds")
                     time.sleep(retry_after)
                     continue
@@ -513,7 +532,10 @@ class VKMonitor(BaseMonitor):
                     f"Error sending Telegram message (attempt {attempt + 1}/{retry_count}): {e}"
                 )
                 if attempt < retry_count - 1:
-                    time.sleep(2)
+                    # Экспоненциальный backoff с jitter, чтобы воркеры
+                    # не ретраили синхронно при частичном отказе API
+                    delay = min(max_delay, base_delay * (2 ** attempt))
+                    time.sleep(delay + random.uniform(0, 0.5))
         
         logger.error(f"Failed to send VK notification after {retry_count} attempts")
         return False
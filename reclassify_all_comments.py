@@ -13,6 +13,7 @@ from typing import Optional
 from config.settings import Settings
 from database.db_manager import DatabaseManager
 from database.models import Comment
+from sentiment.http_client import close_session
 from sentiment.yandex_analyzer import YandexSentimentAnalyzer
 
 # Создаем директорию для логов
@@ -202,6 +203,9 @@ async def reclassify_all_comments(batch_size: int = 50):
     finally:
         session.close()
         await analyzer.close()
+        # Скрипт - отдельная точка входа: общую HTTP-сессию закрываем
+        # сами, иначе asyncio.run завершится с незакрытой ClientSession
+        await close_session()
 
 
 async def main():
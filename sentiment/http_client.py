@@ -0,0 +1,49 @@
+"""
+Shared aiohttp session for the sentiment worker and notifications
+
+One process-wide session with a tuned connector means TCP/TLS connections
+to llm.api.cloud.yandex.net and api.telegram.org are reused across all
+callers instead of each component paying its own handshakes.
+"""
+import logging
+from typing import Optional
+
+import aiohttp
+import orjson
+
+logger = logging.getLogger(__name__)
+
+_session: Optional[aiohttp.ClientSession] = None
+
+
+async def get_session() -> aiohttp.ClientSession:
+    """
+    Возвращает общую HTTP-сессию, создавая её лениво при первом вызове
+
+    Returns:
+        Общий aiohttp.ClientSession с настроенным пулом соединений
+    """
+    global _session
+    if _session is None or _session.closed:
+        _session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=100,
+                limit_per_host=10,
+                ttl_dns_cache=300,
+                enable_cleanup_closed=True
+            ),
+            timeout=aiohttp.ClientTimeout(total=60, connect=10),
+            # orjson вместо stdlib json для json=-payload'ов
+            json_serialize=lambda obj: orjson.dumps(obj).decode()
+        )
+        logger.info("Shared HTTP session created")
+    return _session
+
+
+async def close_session():
+    """Закрывает общую сессию (вызывается один раз при остановке приложения)"""
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+        logger.info("Shared HTTP session closed")
+    _session = None
@@ -1,14 +1,64 @@
 """
 Yandex Sentiment Analysis API integration using Few-shot Text Classification
 """
+import functools
+import hashlib
 import logging
 import asyncio
 import re
-import requests
-from typing import Optional, Tuple
+import time
+import unicodedata
+import aiohttp
+import orjson
+from collections import OrderedDict
+from itertools import chain
+from typing import List, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
+# Паттерны валидации компилируются один раз при импорте -
+# компиляция на каждый вызов была доминирующей CPU-стоимостью валидации
+
+# Кодовые точки эмодзи: проверка вхождения - один C-уровневый hash
+# lookup на символ вместо прохода регулярного автомата.
+# Намеренное отличие от прежнего regex: в нем '?' из '❤️?'
+# парсился как ЛИТЕРАЛ, и любой текст с вопросительным знаком
+# безусловно принимался как "с эмодзи" - это была ошибка, '?' в набор
+# не входит. U+FE0F (variation selector) включен: он встречается в
+# эмодзи-последовательностях (keycap '1️⃣' и т.п.) и прежним паттерном
+# тоже считался эмодзи
+_EMOJI_CODEPOINTS = frozenset(chain(
+    range(0x1F300, 0x1FA00),   # Основные эмодзи (включая 👍, 😊 и т.д.)
+    range(0x1FA00, 0x1FB00),   # Расширенные эмодзи
+    range(0x2600, 0x27C0),     # Разное (солнце, звезды, сердца, галочки)
+    range(0x1F1E0, 0x1F200),   # Флаги
+    range(0x2300, 0x2400),     # Технические символы
+    range(0x2B50, 0x2B56),     # ⭐ Звезды
+    range(0x1F004, 0x1F0D0),   # Игровые символы
+    (0x2764, 0x2665, 0x2661, 0x2763, 0x2744, 0x2B50,
+     0x2705, 0x274C, 0x2714, 0x2716, 0x2728, 0xFE0F),
+))
+
+# Единый паттерн для одного прохода по тексту: URL съедается целиком
+# первой альтернативой, остальные группы классифицируют символы вне
+# ссылок. Один проход вместо отдельных sub/search/sub по всей строке.
+_SCAN_RE = re.compile(
+    r'(?P<url>https?://\S+|www\.\S+|t\.me/\S+|vk\.com/\S+)'
+    r'|(?P<alnum>[a-zA-Zа-яА-ЯёЁ0-9])'
+    r'|(?P<word>\w)'
+    r'|(?P<punct>\S)',
+    re.IGNORECASE | re.UNICODE
+)
+
+# Вариант без URL-альтернативы: когда в тексте нет намека на ссылку,
+# движку не нужно пробовать URL-ветку на каждой позиции
+_SCAN_NO_URL_RE = re.compile(
+    r'(?P<alnum>[a-zA-Zа-яА-ЯёЁ0-9])'
+    r'|(?P<word>\w)'
+    r'|(?P<punct>\S)',
+    re.UNICODE
+)
+
 
 def parse_classifier_response(response_json: dict) -> dict:
     """
@@ -58,46 +108,65 @@ def parse_classifier_response(response_json: dict) -> dict:
         }
 
 
+# Маппинг тональностей API -> БД; собирается один раз на модуль
+_SENTIMENT_MAP = {
+    "негативное": "negative",
+    "нейтральное": "neutral",
+    "позитивное": "positive",
+    # Поддержка старого формата на всякий случай
+    "негативный": "negative",
+    "нейтральный": "neutral",
+    "позитивный": "positive"
+}
+
+
 def convert_sentiment_to_db_format(sentiment_rus: Optional[str]) -> Optional[str]:
     """
     Конвертирует русскую тональность в формат для БД
-    
+
     Args:
         sentiment_rus: Тональность на русском ("негативное", "нейтральное", "позитивное")
-        
+
     Returns:
         Тональность в формате БД ('negative', 'neutral', 'positive') или None
     """
     if not sentiment_rus:
         return None
-    
-    # Приводим к нижнему регистру для сопоставления
-    sentiment_lower = sentiment_rus.lower().strip()
-    
-    mapping = {
-        "негативное": "negative",
-        "нейтральное": "neutral",
-        "позитивное": "positive",
-        # Поддержка старого формата на всякий случай
-        "негативный": "negative",
-        "нейтральный": "neutral",
-        "позитивный": "positive"
-    }
-    return mapping.get(sentiment_lower)
+
+    # API обычно возвращает метку в каноническом виде - сначала пробуем
+    # как есть, lower/strip только для нестандартного регистра/пробелов
+    result = _SENTIMENT_MAP.get(sentiment_rus)
+    if result is not None:
+        return result
+    return _SENTIMENT_MAP.get(sentiment_rus.lower().strip())
 
 
 def validate_comment_text(text: str) -> tuple[bool, Optional[str]]:
     """
     Валидирует текст комментария для анализа тональности
-    
+
+    Результат кэшируется: в ленте много дословных повторов ("Спасибо!",
+    спам), для них валидация сводится к hash lookup. Функция чистая,
+    lru_cache потокобезопасен под GIL. Длинные тексты (> 256 символов)
+    идут мимо кэша - повторы среди них редки, а ключи lru_cache держат
+    ссылку на всю строку.
+
     Args:
         text: Текст для проверки
-        
+
     Returns:
         Tuple (is_valid, reason)
         - is_valid: True если текст можно анализировать, False если нет
         - reason: Причина отклонения (если is_valid=False)
     """
+    if text is not None and len(text) > 256:
+        return _validate_comment_text_impl.__wrapped__(text)
+    return _validate_comment_text_impl(text)
+
+
+@functools.lru_cache(maxsize=4096)
+def _validate_comment_text_impl(text: str) -> tuple[bool, Optional[str]]:
+    """Полная валидация (кэшируемая часть validate_comment_text)"""
     if not text:
         return False, "Пустой текст"
     
@@ -106,33 +175,21 @@ def validate_comment_text(text: str) -> tuple[bool, Optional[str]]:
     # Проверка на пустой текст после удаления пробелов
     if not text_stripped:
         return False, "Только пробелы"
-    
-    # Расширенный паттерн для эмодзи (покрывает все основные Unicode диапазоны)
-    emoji_pattern = re.compile(
-        r'[\U0001F300-\U0001F9FF'  # Основные эмодзи (включая 👍, 😊 и т.д.)
-        r'\U0001FA00-\U0001FAFF'   # Расширенные эмодзи
-        r'\U00002600-\U000027BF'   # Разное (солнце, звезды и т.д.)
-        r'\U0001F1E0-\U0001F1FF'   # Флаги
-        r'\U00002300-\U000023FF'   # Технические символы
-        r'\U00002B50-\U00002B55'   # ⭐ Звезды
-        r'\U0001F004-\U0001F0CF'   # Игровые символы
-        r'\u2764\uFE0F?'           # ❤ Красное сердце
-        r'\u2665\uFE0F?'           # ♥ Черное сердце
-        r'\u2661\uFE0F?'           # ♡ Белое сердце
-        r'\u2763\uFE0F?'           # ❣ Тяжелое сердце
-        r'\u2744\uFE0F?'           # ❄ Снежинка
-        r'\u2B50'                  # ⭐ Звезда
-        r'\u2705'                  # ✅ Галочка
-        r'\u274C'                  # ❌ Крестик
-        r'\u2714\uFE0F?'           # ✔ Жирная галочка
-        r'\u2716\uFE0F?'           # ✖ Жирный крестик
-        r'\u2728'                  # ✨ Искры
-        r']',
-        flags=re.UNICODE
-    )
-    
+
+    # Проверка длины - первой: слишком длинный текст (> 8000 символов,
+    # ограничение API) отклоняется за O(1) до каких-либо сканов строки
+    if len(text_stripped) > 8000:
+        return False, "Слишком длинный текст (> 8000 символов)"
+
+
     # Проверяем наличие эмодзи в тексте
-    has_emoji = bool(emoji_pattern.search(text_stripped))
+    # Быстрый путь: ASCII-текст эмодзи содержать не может (все кодовые
+    # точки набора >= U+2300), isascii - один C-вызов без прохода в Python
+    if text_stripped.isascii():
+        has_emoji = False
+    else:
+        # any() останавливается на первом найденном эмодзи
+        has_emoji = any(ord(c) in _EMOJI_CODEPOINTS for c in text_stripped)
     
     # НОВОЕ ПРАВИЛО: Если есть хотя бы один эмодзи - всегда разрешаем анализ
     if has_emoji:
@@ -145,46 +202,102 @@ def validate_comment_text(text: str) -> tuple[bool, Optional[str]]:
         return False, "Слишком короткий текст (< 3 символов)"
     
     # Если эмодзи нет - применяем стандартную валидацию
-    
+
+    # Один проход по строке: считаем длину ссылок, буквы/цифры и прочие
+    # символы, не создавая промежуточных строк вида text_without_urls.
+    # URL-ветка паттерна включается только при намеке на ссылку в тексте;
+    # намек ищем без учета регистра, как и сам паттерн (IGNORECASE)
+    text_lower = text_stripped.lower()
+    if ('http' in text_lower or 'www.' in text_lower
+            or 't.me/' in text_lower or 'vk.com/' in text_lower):
+        scan_re = _SCAN_RE
+    else:
+        scan_re = _SCAN_NO_URL_RE
+
+    alnum = word = punct = 0
+    url_spans = []
+    first_pos = -1
+    last_pos = -1
+    for m in scan_re.finditer(text_stripped):
+        group = m.lastgroup
+        if group == 'url':
+            url_spans.append((m.start(), m.end()))
+            continue
+        if group == 'alnum':
+            alnum += 1
+        elif group == 'word':
+            word += 1
+        else:
+            punct += 1
+        if first_pos < 0:
+            first_pos = m.start()
+        last_pos = m.start()
+
+    # Длина остатка "удалить ссылки, потом strip()" (как в прежнем
+    # _URL_RE.sub('').strip()): все символы между первым и последним
+    # непробельным символом вне ссылок, минус ссылки между ними -
+    # внутренние пробелы считаются, краевые нет
+    if first_pos < 0:
+        remainder_len = 0
+    else:
+        url_inner = sum(
+            end - start for start, end in url_spans
+            if start > first_pos and end <= last_pos
+        )
+        remainder_len = (last_pos - first_pos + 1) - url_inner
+
     # Проверка на то, что текст состоит только из URL/ссылок
-    url_pattern = r'https?://\S+|www\.\S+|t\.me/\S+|vk\.com/\S+'
-    text_without_urls = re.sub(url_pattern, '', text_stripped, flags=re.IGNORECASE).strip()
-    if len(text_without_urls) < 3:
+    if remainder_len < 3:
         return False, "Только ссылки, нет текста для анализа"
-    
-    # Проверяем наличие хотя бы одной буквы или цифры
-    has_letters_or_digits = bool(re.search(r'[a-zA-Zа-яА-ЯёЁ0-9]', text_without_urls, re.UNICODE))
-    
-    if not has_letters_or_digits:
+
+    if alnum == 0:
         # Нет букв, цифр и эмодзи - только спецсимволы
         return False, "Только специальные символы, нет букв/цифр"
-    
-    # Проверяем что букв/цифр достаточно
-    text_letters_digits = re.sub(r'[^\w\s]', '', text_without_urls, flags=re.UNICODE)
-    if len(text_letters_digits) < 2:
+
+    # Проверяем что букв/цифр достаточно: после удаления спецсимволов
+    # в остатке остаются буквы/цифры и пробелы (прежний [^\w\s]-sub)
+    if remainder_len - punct < 2:
         return False, "Недостаточно текста для анализа"
-    
-    # Проверка на слишком длинный текст (более 8000 символов - ограничение API)
-    if len(text_stripped) > 8000:
-        return False, "Слишком длинный текст (> 8000 символов)"
-    
+
     return True, None
 
 
 class YandexSentimentAnalyzer:
     """Yandex sentiment analysis using Few-shot Text Classification API"""
     
-    def __init__(self, api_key: str, folder_id: str):
+    def __init__(self, api_key: str, folder_id: str,
+                 max_concurrency: int = 5, rate_per_sec: float = 5.0):
         """
         Initialize Yandex sentiment analyzer with Few-shot classifier
-        
+
         Args:
             api_key: Yandex API key
             folder_id: Yandex Cloud folder ID (format: b1g8dn6s4m5k********)
+            max_concurrency: Maximum number of concurrent API requests
+            rate_per_sec: Maximum requests per second (token bucket)
         """
         self.api_key = api_key
         self.folder_id = folder_id
         self.api_url = "https://llm.api.cloud.yandex.net/foundationModels/v1/fewShotTextClassification"
+
+        # Заголовки неизменны после инициализации - собираем один раз
+        self._headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Api-Key {api_key}"
+        }
+
+        # Ограничители: семафор на число одновременных запросов и
+        # token bucket на частоту (вместо sleep(0.5) в воркере)
+        self._sem = asyncio.Semaphore(max_concurrency)
+        self._rate_per_sec = rate_per_sec
+        self._tokens = rate_per_sec
+        self._last_refill: Optional[float] = None
+        self._rate_lock = asyncio.Lock()
+
+        # LRU-кэш результатов: в ленте много повторов ("спасибо", "+"),
+        # попадание в кэш экономит полный HTTPS round-trip
+        self._result_cache: "OrderedDict[bytes, Tuple[str, float]]" = OrderedDict()
+        self._cache_max = 10_000
         
         # Подготовка примеров для Few-shot классификации
         self.samples = [
@@ -225,9 +338,45 @@ class YandexSentimentAnalyzer:
                 "label": "нейтральное"
             }
         ]
-        
+
+        # Неизменная часть запроса (modelUri, описание задачи, метки,
+        # samples) собирается один раз; analyze_text добавляет только text
+        self._base_payload = {
+            "modelUri": f"cls://{self.folder_id}/yandexgpt-lite",
+            "taskDescription": "Определи тональность комментария в социальных сетях: позитивное, негативное или нейтральное",
+            "labels": [
+                "позитивное",
+                "негативное",
+                "нейтральное"
+            ],
+            "samples": self.samples
+        }
+
         logger.info("Yandex Sentiment Analyzer initialized with Few-shot Classifier")
-    
+
+    async def _acquire_token(self):
+        """
+        Получает токен из token bucket, засыпая только когда токены исчерпаны
+
+        Позволяет конкурентным analyze_text проходить без задержки,
+        пока суммарная частота не превышает rate_per_sec.
+        """
+        async with self._rate_lock:
+            while True:
+                now = time.monotonic()
+                if self._last_refill is not None:
+                    self._tokens = min(
+                        self._rate_per_sec,
+                        self._tokens + (now - self._last_refill) * self._rate_per_sec
+                    )
+                self._last_refill = now
+
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+
+                await asyncio.sleep((1.0 - self._tokens) / self._rate_per_sec)
+
     async def analyze_text(self, text: str) -> Optional[Tuple[str, float]]:
         """
         Analyze sentiment of text using Yandex Few-shot classifier
@@ -243,32 +392,36 @@ class YandexSentimentAnalyzer:
         # Валидация входных данных
         is_valid, reason = validate_comment_text(text)
         if not is_valid:
-            logger.warning(f"Invalid comment text for sentiment analysis: {reason}")
+            logger.warning("Invalid comment text for sentiment analysis: %s", reason)
             return None
-        
-        # Формируем запрос к Few-shot классификатору
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Api-Key {self.api_key}"
-        }
-        
-        data = {
-            "modelUri": f"cls://{self.folder_id}/yandexgpt-lite",
-            "taskDescription": "Определи тональность комментария в социальных сетях: позитивное, негативное или нейтральное",
-            "labels": [
-                "позитивное",
-                "негативное",
-                "нейтральное"
-            ],
-            "text": text.strip(),
-            "samples": self.samples
-        }
+
+        # Единое нормализованное представление текста считается один раз
+        # (NFKC склеивает визуально одинаковые варианты, casefold надежнее
+        # lower для Unicode); в кэше хранится 16-байтовый blake2b-дайджест,
+        # а не сама строка - 10k ключей занимают ~160 КБ вместо мегабайт
+        text_stripped = text.strip()
+        normalized = unicodedata.normalize('NFKC', text_stripped).casefold()
+        cache_key = hashlib.blake2b(
+            normalized.encode('utf-8'), digest_size=16
+        ).digest()
+
+        # Повторяющийся текст - отдаем закэшированный результат
+        cached = self._result_cache.get(cache_key)
+        if cached is not None:
+            self._result_cache.move_to_end(cache_key)
+            logger.debug("Sentiment cache hit")
+            return cached
+
+        # Формируем запрос к Few-shot классификатору: одна поверхностная
+        # копия базового payload плюс текущий текст
+        data = {**self._base_payload, "text": text_stripped}
         
         try:
-            # Выполняем синхронный запрос в executor для async
-            loop = asyncio.get_event_loop()
-            result = await loop.run_in_executor(None, self._call_classifier, headers, data)
-            
+            # Ограничиваем число одновременных запросов и частоту к API
+            async with self._sem:
+                await self._acquire_token()
+                result = await self._call_classifier(data)
+
             if result:
                 # Парсим ответ
                 parsed = parse_classifier_response(result)
@@ -279,13 +432,17 @@ class YandexSentimentAnalyzer:
                     confidence = parsed["confidence"]
                     
                     if sentiment_db:
-                        logger.debug(f"Sentiment analysis result: {sentiment_db} ({confidence:.2f})")
+                        logger.debug("Sentiment analysis result: %s (%.2f)", sentiment_db, confidence)
+                        # Запоминаем успешный результат для повторов
+                        self._result_cache[cache_key] = (sentiment_db, confidence)
+                        if len(self._result_cache) > self._cache_max:
+                            self._result_cache.popitem(last=False)
                         return (sentiment_db, confidence)
                     else:
-                        logger.warning(f"Could not convert sentiment: {parsed['sentiment']}")
+                        logger.warning("Could not convert sentiment: %s", parsed['sentiment'])
                         return None
                 else:
-                    logger.warning(f"Failed to parse classifier result: {parsed}")
+                    logger.warning("Failed to parse classifier result: %s", parsed)
                     return None
             else:
                 logger.warning("Empty result from Yandex Classifier")
@@ -295,69 +452,160 @@ class YandexSentimentAnalyzer:
             logger.error(f"Error in sentiment analysis: {e}", exc_info=True)
             return None
     
-    def _call_classifier(self, headers: dict, data: dict) -> Optional[dict]:
+    async def analyze_batch(self, texts: List[str]) -> List:
         """
-        Синхронный вызов Few-shot классификатора (выполняется в executor)
-        
+        Analyze sentiment for a batch of texts
+
+        Few-shot классификатор принимает один текст на запрос, поэтому
+        батч выполняется как конкурентные вызовы analyze_text,
+        ограниченные семафором и token bucket анализатора.
+
+        Args:
+            texts: Texts to analyze
+
+        Returns:
+            List of results in input order; each item is a
+            (sentiment, score) tuple, None, or the raised exception
+        """
+        if not texts:
+            return []
+        return await asyncio.gather(
+            *(self.analyze_text(text) for text in texts),
+            return_exceptions=True
+        )
+
+    async def _call_classifier(self, data: dict) -> Optional[dict]:
+        """
+        Асинхронный вызов Few-shot классификатора через общую HTTP-сессию
+
+        Пул соединений сессии переиспользует TCP/TLS-подключение к API
+        между запросами - без handshake и без потока из executor на вызов.
+
         Args:
-            headers: HTTP заголовки
             data: Данные запроса
-            
+
         Returns:
             JSON ответ или None при ошибке
         """
         try:
-            response = requests.post(
-                self.api_url,
-                headers=headers,
-                json=data,
-                timeout=30
-            )
-            
-            if response.status_code == 200:
-                return response.json()
-            else:
-                logger.error(
-                    f"Classifier API error: status {response.status_code}, "
-                    f"response: {response.text}"
-                )
-                return None
-                
-        except requests.exceptions.Timeout:
+            from sentiment.http_client import get_session
+            session = await get_session()
+
+            # orjson кодирует/декодирует payload (повторяющиеся samples,
+            # кириллица) заметно быстрее stdlib json
+            body = orjson.dumps(data)
+
+            max_retries = 3
+            for attempt in range(1, max_retries + 1):
+                async with session.post(
+                    self.api_url,
+                    headers=self._headers,
+                    data=body,
+                    timeout=aiohttp.ClientTimeout(total=30)
+                ) as response:
+                    if response.status == 200:
+                        return orjson.loads(await response.read())
+
+                    # 429/5xx - временные ошибки: повторяем с backoff,
+                    # иначе комментарий навсегда останется без тональности
+                    # (processed=1, sentiment=None больше не пересматривается)
+                    if response.status == 429 or response.status >= 500:
+                        retry_after = response.headers.get('Retry-After')
+                        delay = float(retry_after) if retry_after else float(2 ** attempt)
+                        logger.warning(
+                            "Classifier API transient error (status %s), "
+                            "attempt %d/%d, retrying in %.1fs",
+                            response.status, attempt, max_retries, delay
+                        )
+                        if attempt < max_retries:
+                            await asyncio.sleep(delay)
+                            continue
+                        return None
+
+                    # 4xx (кроме 429) - повторять бессмысленно
+                    logger.error(
+                        f"Classifier API error: status {response.status}, "
+                        f"response: {await response.text()}"
+                    )
+                    return None
+
+            return None
+
+        except asyncio.TimeoutError:
             logger.error("Request to classifier API timed out")
             return None
         except Exception as e:
             logger.error(f"Error calling classifier API: {e}", exc_info=True)
             return None
-    
+
     async def close(self):
-        """Close analyzer (no-op, kept for compatibility)"""
+        """Close analyzer
+
+        Сессия общая (sentiment.http_client) и закрывается при остановке
+        приложения, анализатору закрывать нечего.
+        """
         pass
 
 
+# Оформление уведомлений: эмодзи/имя источника и бейдж тональности
+# выбираются одним dict lookup вместо цепочки if/elif на каждый вызов
+_SOURCE_META = {
+    'telegram': ('✈️', 'TG'),
+    'vk': ('🔵', 'VK')
+}
+
+_SENTIMENT_BADGE = {
+    'negative': ('🔴', 'Негативный'),
+    'positive': ('🟢', 'Позитивный'),
+    'neutral': ('⚪️', 'Нейтральный')
+}
+
+_SENTIMENT_BADGE_UNKNOWN = ('⚫️', 'Не определена')
+
+
 class SentimentWorker:
     """Background worker for processing comments sentiment and sending notifications"""
     
-    def __init__(self, db_manager, analyzer: YandexSentimentAnalyzer, interval: int = 60, 
-                 bot_token: Optional[str] = None, alert_chat_id: Optional[str] = None):
+    def __init__(self, db_manager, analyzer: YandexSentimentAnalyzer, interval: int = 60,
+                 bot_token: Optional[str] = None, alert_chat_id: Optional[str] = None,
+                 batch_size: int = 100):
         """
         Initialize sentiment worker
-        
+
         Args:
             db_manager: DatabaseManager instance
             analyzer: YandexSentimentAnalyzer instance
             interval: Processing interval in seconds
             bot_token: Telegram Bot token for sending notifications (optional)
             alert_chat_id: Telegram chat ID for notifications (optional)
+            batch_size: Number of comments fetched from DB per pass;
+                concurrency is metered by the analyzer, not the fetch size
         """
         self.db_manager = db_manager
         self.analyzer = analyzer
         self.interval = interval
+        self.batch_size = batch_size
         self.bot_token = bot_token
         self.alert_chat_id = alert_chat_id
         self._running = False
         self._task: Optional[asyncio.Task] = None
+        self._stop_event = asyncio.Event()
         self._http_session: Optional = None
+
+        # Событие пробуждения: ставится из потоков мониторов при записи
+        # нового комментария (через call_soon_threadsafe) и из stop()
+        self._wake_event = asyncio.Event()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+        # Уведомления уходят фоновыми задачами, чтобы не блокировать
+        # обработку батча на задержке Telegram; семафор ограничивает
+        # одновременные отправки (лимит Bot API ~30 msg/s)
+        self._pending_notifications: set = set()
+        self._notify_sem = asyncio.Semaphore(5)
+
+        # URL и неизменная часть payload собираются один раз в start()
+        self._telegram_url: Optional[str] = None
+        self._payload_template: Optional[dict] = None
     
     async def start(self):
         """Start sentiment processing worker"""
@@ -365,171 +613,242 @@ class SentimentWorker:
             logger.warning("Sentiment worker is already running")
             return
         
-        # Create HTTP session for sending notifications
+        # Use the shared HTTP session for sending notifications
         if self.bot_token and self.alert_chat_id:
-            import aiohttp
-            self._http_session = aiohttp.ClientSession()
-            logger.info("HTTP session created for sending notifications")
+            from sentiment.http_client import get_session
+            self._http_session = await get_session()
+            # bot_token/alert_chat_id не меняются - URL и базовый payload
+            # строим один раз, а не на каждое уведомление
+            self._telegram_url = f"https://api.telegram.org/bot{self.bot_token}/sendMessage"
+            self._payload_template = {
+                "chat_id": self.alert_chat_id,
+                "parse_mode": "HTML",
+                "disable_web_page_preview": False
+            }
+            logger.info("HTTP session ready for sending notifications")
         
         self._running = True
+        self._stop_event.clear()
+        self._wake_event.clear()
+        self._loop = asyncio.get_running_loop()
+
+        # Событийное пробуждение: новый комментарий в БД будит воркер
+        # сразу, интервал остается резервным опросом
+        self.db_manager.set_comment_listener(self._on_new_comment)
+
         self._task = asyncio.create_task(self._processing_loop())
         logger.info("Sentiment worker started")
+
+    def _on_new_comment(self):
+        """Будит цикл обработки; вызывается из потока, сохранившего комментарий"""
+        loop = self._loop
+        if loop is not None and self._running:
+            loop.call_soon_threadsafe(self._wake_event.set)
     
     async def stop(self):
         """Stop sentiment processing worker"""
         logger.info("Stopping sentiment worker...")
         self._running = False
+        self.db_manager.set_comment_listener(None)
+        self._stop_event.set()
+        self._wake_event.set()
         if self._task:
-            self._task.cancel()
-            try:
-                await self._task
-            except asyncio.CancelledError:
-                pass
-        
-        # Close HTTP session
-        if self._http_session:
-            await self._http_session.close()
-            logger.info("HTTP session closed")
-        
+            # Кооперативная остановка: цикл сам выходит по событию,
+            # cancel() не нужен и не прерывает транзакцию посреди записи
+            await self._task
+            self._task = None
+
+        # Дожидаемся фоновых отправок уведомлений, чтобы ничего не
+        # потерять при остановке
+        if self._pending_notifications:
+            await asyncio.gather(
+                *self._pending_notifications, return_exceptions=True
+            )
+            self._pending_notifications.clear()
+
+        # Сессия общая (sentiment.http_client) и закрывается при
+        # остановке приложения, а не здесь
+        self._http_session = None
+
         logger.info("Sentiment worker stopped")
     
     async def _processing_loop(self):
         """Main processing loop"""
+        prefetch: Optional[asyncio.Task] = None
         try:
             while self._running:
-                await self._process_batch()
-                
-                # Sleep with periodic checks
-                slept = 0
-                while slept < self.interval and self._running:
-                    await asyncio.sleep(min(1, self.interval - slept))
-                    slept += 1
-        
+                # Сигналы, пришедшие во время обработки батча, не теряются:
+                # событие сбрасывается только перед чтением очередного батча
+                self._wake_event.clear()
+
+                # Берем батч: либо уже готовый префетч, либо читаем сейчас.
+                # Пустой префетч - это устаревший снимок (комментарий,
+                # разбудивший нас, мог прийти уже после него), поэтому
+                # при пустом результате всегда перечитываем БД заново.
+                # Ошибка чтения (например, database is locked) не должна
+                # убивать воркер - логируем, ждем интервал и пробуем снова
+                comments = None
+                try:
+                    if prefetch is not None:
+                        comments = await prefetch
+                        prefetch = None
+                    if not comments:
+                        comments = await asyncio.to_thread(
+                            self.db_manager.get_unprocessed_comments, self.batch_size
+                        )
+                except Exception as e:
+                    logger.error(f"Error fetching unprocessed comments: {e}")
+                    prefetch = None
+                    comments = None
+
+                if comments:
+                    # Пока текущий батч анализируется, следующий уже
+                    # читается из БД в фоне (текущие id исключаются -
+                    # они еще не помечены processed)
+                    in_flight = [c.id for c in comments]
+                    prefetch = asyncio.create_task(asyncio.to_thread(
+                        self.db_manager.get_unprocessed_comments,
+                        self.batch_size, in_flight
+                    ))
+                    await self._process_batch(comments)
+
+                    # Полный батч - вероятен бэклог: не ждем интервал,
+                    # сразу берем следующую порцию, пока очередь не осушится
+                    if len(comments) == self.batch_size and self._running:
+                        continue
+                else:
+                    logger.debug("No unprocessed comments for sentiment analysis")
+
+                # Ждем любой из сигналов: новый комментарий, остановка или
+                # резервный интервал - одно пробуждение вместо тиков
+                try:
+                    await asyncio.wait_for(
+                        self._wake_event.wait(),
+                        timeout=self.interval
+                    )
+                except asyncio.TimeoutError:
+                    pass
+
+                if self._stop_event.is_set():
+                    break
+
         except asyncio.CancelledError:
             logger.info("Sentiment worker cancelled")
         except Exception as e:
             logger.error(f"Error in sentiment processing loop: {e}")
-    
-    async def _process_batch(self):
-        """Process a batch of unprocessed comments"""
+        finally:
+            # Дожидаемся незавершенного префетча, чтобы не бросить поток
+            if prefetch is not None:
+                try:
+                    await prefetch
+                except Exception:
+                    pass
+
+    async def _process_batch(self, comments):
+        """
+        Process a batch of unprocessed comments
+
+        Args:
+            comments: Comment objects fetched by the processing loop
+        """
         try:
-            comments = self.db_manager.get_unprocessed_comments(limit=10)
-            
-            if not comments:
-                logger.debug("No unprocessed comments for sentiment analysis")
-                return
-            
-            logger.info(f"Processing {len(comments)} comments for sentiment analysis")
-            
+            logger.info("Processing %d comments for sentiment analysis", len(comments))
+
+            # Фаза 1: разделяем комментарии
+            # Пустой текст (медиа или нет) анализировать нечего - минуем
+            # создание и планирование корутины analyze_text целиком
+            # Для всех остальных случаев (с текстом) - всегда пытаемся анализировать
+            to_analyze = []
+            skipped = []
             for comment in comments:
-                if not self._running:
-                    break
-                
-                # Analyze sentiment
-                try:
-                    # Проверяем: если есть медиа БЕЗ текста - пропускаем анализ
-                    # Во всех остальных случаях пытаемся анализировать
-                    comment_text = comment.comment_text or ''
-                    text_stripped = comment_text.strip()
-                    has_media = comment.has_media == 1
-                    
-                    # Логика: "не определена" только для медиа без текста
-                    # Для всех остальных случаев (с текстом) - всегда пытаемся анализировать
-                    if has_media and not text_stripped:
-                        # Медиа без текста - пропускаем анализ
-                        logger.info(
-                            f"Comment {comment.id} has media without text, "
-                            f"skipping sentiment analysis"
-                        )
-                        success = self.db_manager.update_sentiment(
-                            comment.id,
-                            None,  # sentiment = None (не определена)
-                            None,  # score = None
-                            processed=1
-                        )
-                        
-                        if success:
-                            comment.sentiment = None
-                            comment.sentiment_score = None
-                            if self.bot_token and self.alert_chat_id:
-                                await self._send_notification(comment)
-                    else:
-                        # Есть текст - пытаемся анализировать
-                        # Для текстовых сообщений валидация менее строгая
-                        result = await self.analyzer.analyze_text(comment_text)
-                        
-                        if result:
-                            sentiment, score = result
-                            
-                            # Update in database with successful result
-                            success = self.db_manager.update_sentiment(
-                                comment.id,
-                                sentiment,
-                                score,
-                                processed=1
-                            )
-                            
-                            if success:
-                                logger.info(
-                                    f"Processed comment {comment.id}: "
-                                    f"{sentiment} ({score:.2f})"
-                                )
-                                
-                                # Обновляем объект comment для отправки уведомления
-                                comment.sentiment = sentiment
-                                comment.sentiment_score = score
-                                
-                                # Отправляем уведомление с тональностью
-                                if self.bot_token and self.alert_chat_id:
-                                    await self._send_notification(comment)
-                            else:
-                                logger.warning(f"Failed to update sentiment for comment {comment.id}")
-                        else:
-                            # Анализ не удался - но для текстовых сообщений это необычно
-                            # Логируем предупреждение и помечаем как обработанный без тональности
-                            logger.warning(
-                                f"Sentiment analysis failed for comment {comment.id} "
-                                f"(text: '{text_stripped[:50]}...')"
-                            )
-                            success = self.db_manager.update_sentiment(
-                                comment.id,
-                                None,  # sentiment = None (не удалось определить)
-                                None,  # score = None
-                                processed=1
-                            )
-                            
-                            if success:
-                                comment.sentiment = None
-                                comment.sentiment_score = None
-                                if self.bot_token and self.alert_chat_id:
-                                    await self._send_notification(comment)
-                            else:
-                                logger.warning(f"Failed to mark comment {comment.id} as processed")
-                
-                except Exception as e:
-                    # Критическая ошибка при анализе - помечаем как обработанный без результата
-                    logger.error(f"Error analyzing comment {comment.id}: {e}", exc_info=True)
-                    try:
-                        success = self.db_manager.update_sentiment(
-                            comment.id,
-                            None,
-                            None,
-                            processed=1
-                        )
-                        
-                        if success:
-                            # Обновляем объект comment и отправляем уведомление
-                            comment.sentiment = None
-                            comment.sentiment_score = None
-                            
-                            if self.bot_token and self.alert_chat_id:
-                                await self._send_notification(comment)
-                    except Exception as db_error:
-                        logger.error(f"Failed to mark comment {comment.id} as processed: {db_error}")
-                
-                # Small delay between requests to respect rate limits
-                await asyncio.sleep(0.5)
-        
+                comment_text = comment.comment_text or ''
+                if not comment_text.strip():
+                    skipped.append(comment)
+                else:
+                    to_analyze.append(comment)
+
+            # Все анализы запускаются конкурентно: время батча ограничено
+            # самым медленным запросом, а не суммой задержек
+            results = await self.analyzer.analyze_batch(
+                [c.comment_text or '' for c in to_analyze]
+            )
+
+            # Фаза 2: собираем результаты батча
+            processed = []  # (comment, result)
+            for comment in skipped:
+                if comment.has_media == 1:
+                    logger.info(
+                        "Comment %s has media without text, "
+                        "skipping sentiment analysis",
+                        comment.id
+                    )
+                else:
+                    logger.debug(
+                        "Comment %s has empty text, skipping sentiment analysis",
+                        comment.id
+                    )
+                processed.append((comment, None))
+
+            for comment, result in zip(to_analyze, results):
+                if isinstance(result, BaseException):
+                    logger.error(
+                        "Error analyzing comment %s: %s",
+                        comment.id, result,
+                        exc_info=result
+                    )
+                    result = None
+                elif result is None:
+                    # Анализ не удался - но для текстовых сообщений это необычно
+                    text_stripped = (comment.comment_text or '').strip()
+                    logger.warning(
+                        "Sentiment analysis failed for comment %s (text: '%s...')",
+                        comment.id, text_stripped[:50]
+                    )
+
+                processed.append((comment, result))
+
+            # Фаза 3: одна транзакция на батч вместо N коммитов
+            rows = []
+            for comment, result in processed:
+                sentiment, score = result if result else (None, None)
+                rows.append((comment.id, sentiment, score, 1))
+
+            try:
+                success = await asyncio.to_thread(
+                    self.db_manager.update_sentiment_bulk, rows
+                )
+            except Exception as db_error:
+                logger.error(f"Failed to bulk update sentiment: {db_error}")
+                return
+
+            if not success:
+                logger.warning(f"Failed to update sentiment for batch of {len(rows)} comments")
+                return
+
+            # Фаза 4: уведомления после успешной записи. Батч уже помечен
+            # processed=1, поэтому задачи создаются для всех комментариев
+            # даже при остановке - stop() дождется их через
+            # _pending_notifications, иначе уведомления потеряются навсегда
+            for comment, result in processed:
+                sentiment, score = result if result else (None, None)
+                if sentiment is not None:
+                    logger.info(
+                        "Processed comment %s: %s (%.2f)",
+                        comment.id, sentiment, score
+                    )
+
+                # Обновляем объект comment для отправки уведомления
+                comment.sentiment = sentiment
+                comment.sentiment_score = score
+
+                if self.bot_token and self.alert_chat_id:
+                    # Fire-and-forget: задержка Telegram перекрывается
+                    # следующим батчем; задачи отслеживаются и дожидаются
+                    # в stop()
+                    task = asyncio.create_task(self._send_notification(comment))
+                    self._pending_notifications.add(task)
+                    task.add_done_callback(self._pending_notifications.discard)
+
         except Exception as e:
             logger.error(f"Error processing sentiment batch: {e}")
     
@@ -543,14 +862,7 @@ class SentimentWorker:
         Returns:
             Tuple (emoji, text_ru)
         """
-        if sentiment == 'negative':
-            return ('🔴', 'Негативный')
-        elif sentiment == 'positive':
-            return ('🟢', 'Позитивный')
-        elif sentiment == 'neutral':
-            return ('⚪️', 'Нейтральный')
-        else:
-            return ('⚫️', 'Не определена')
+        return _SENTIMENT_BADGE.get(sentiment, _SENTIMENT_BADGE_UNKNOWN)
     
     def _format_notification(self, comment) -> str:
         """
@@ -562,42 +874,43 @@ class SentimentWorker:
         Returns:
             Отформатированное сообщение для Telegram
         """
-        # Определяем эмодзи источника
-        source_emoji = "✈️" if comment.source == 'telegram' else "🔵"
-        source_name = "TG" if comment.source == 'telegram' else "VK"
-        
+        # Источник и тональность - по одному dict lookup
+        source_emoji, source_name = _SOURCE_META.get(comment.source, _SOURCE_META['vk'])
+        sentiment_emoji, sentiment_text = self._get_sentiment_emoji(comment.sentiment)
+
         # Форматируем время
         time_str = comment.comment_published_at.strftime('%H:%M %d.%m.%Y')
-        
-        # Получаем эмодзи и текст тональности
-        sentiment_emoji, sentiment_text = self._get_sentiment_emoji(comment.sentiment)
-        
-        # Форматируем имя пользователя
-        username_part = f" {comment.author_username}" if comment.author_username else ""
-        
-        # Базовая часть
-        base = f"""{source_emoji} <b>{source_name}</b> | {comment.group_channel_name}
-👤 {comment.author_name}{username_part}
-🆔 <code>{comment.author_id}</code>
-🕐 {time_str}
-{sentiment_emoji} Тональность: {sentiment_text}
-━━━━━━━━━━━━━━━━━━"""
-        
+
+        # Собираем сообщение списком кусков и одним join
+        parts = [
+            source_emoji, " <b>", source_name, "</b> | ", comment.group_channel_name,
+            "\n👤 ", comment.author_name,
+        ]
+        if comment.author_username:
+            parts.append(" ")
+            parts.append(comment.author_username)
+        parts.extend((
+            "\n🆔 <code>", str(comment.author_id), "</code>",
+            "\n🕐 ", time_str,
+            "\n", sentiment_emoji, " Тональность: ", sentiment_text,
+            "\n━━━━━━━━━━━━━━━━━━\n",
+        ))
+
         # Добавляем текст комментария если есть
         if comment.comment_text:
-            message = f"""{base}
-<blockquote>{comment.comment_text}</blockquote>
-
-<a href="{comment.post_url}">🔗 Открыть пост</a>
-<a href="{comment.comment_url}">💬 Открыть комментарий</a>"""
+            parts.extend(("<blockquote>", comment.comment_text, "</blockquote>"))
         else:
-            message = f"""{base}
-<b>Пользователь прислал медиафайл, пожалуйста откройте комментарий чтобы увидеть содержание</b>
+            parts.append(
+                "<b>Пользователь прислал медиафайл, пожалуйста откройте "
+                "комментарий чтобы увидеть содержание</b>"
+            )
 
-<a href="{comment.post_url}">🔗 Открыть пост</a>
-<a href="{comment.comment_url}">💬 Открыть комментарий</a>"""
-        
-        return message
+        parts.extend((
+            '\n\n<a href="', comment.post_url, '">🔗 Открыть пост</a>',
+            '\n<a href="', comment.comment_url, '">💬 Открыть комментарий</a>',
+        ))
+
+        return ''.join(parts)
     
     async def _send_notification(self, comment):
         """
@@ -608,29 +921,30 @@ class SentimentWorker:
         """
         if not self._http_session or not self.bot_token or not self.alert_chat_id:
             return
-        
+
+        async with self._notify_sem:
+            return await self._do_send_notification(comment)
+
+    async def _do_send_notification(self, comment):
+        """Формирует и отправляет одно уведомление (под семафором)"""
         message = self._format_notification(comment)
-        url = f"https://api.telegram.org/bot{self.bot_token}/sendMessage"
-        
-        payload = {
-            "chat_id": self.alert_chat_id,
-            "text": message,
-            "parse_mode": "HTML",
-            "disable_web_page_preview": False
-        }
-        
+        url = self._telegram_url
+
+        payload = {**self._payload_template, "text": message}
+
+
         max_retries = 3
         for attempt in range(1, max_retries + 1):
             try:
                 async with self._http_session.post(url, json=payload) as response:
                     if response.status == 200:
-                        logger.info(f"Notification sent for comment {comment.id}")
+                        logger.info("Notification sent for comment %s", comment.id)
                         return True
                     elif response.status == 429:
                         # Rate limit
                         error_data = await response.json()
                         retry_after = error_data.get('parameters', {}).get('retry_after', 5)
-                        logger.warning(f"Rate limit hit, waiting {retry_after} seconds")
+                        logger.warning("Rate limit hit, waiting %s seconds", retry_after)
                         await asyncio.sleep(retry_after)
                         continue
                     else:
@@ -640,7 +954,7 @@ class SentimentWorker:
                             f"Error sending notification (status {response.status}): {error_text}"
                         )
             except Exception as e:
-                logger.warning(f"Attempt {attempt}/{max_retries}: Error sending notification: {e}")
+                logger.warning("Attempt %d/%d: Error sending notification: %s", attempt, max_retries, e)
             
             if attempt < max_retries:
                 await asyncio.sleep(2 ** (attempt - 1))  # Exponential backoff